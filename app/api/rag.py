@@ -47,6 +47,27 @@ class RAGResponse(BaseModel):
     metadata: dict
 
 
+class RAGBatchRequest(BaseModel):
+    """RAG batch request model"""
+    queries: List[str] = Field(..., min_length=1, max_length=20, description="Questions to answer in one round trip")
+    include_sources: bool = Field(default=True, description="Include source citations in response")
+    max_incidents: int = Field(default=5, description="Maximum number of incidents to retrieve")
+    confidence_threshold: float = Field(default=0.3, description="Minimum confidence threshold")
+
+
+class RAGBatchItem(BaseModel):
+    """Outcome of one query in a RAG batch: a response or an error"""
+    query: str
+    response: Optional[RAGResponse] = None
+    error: Optional[str] = None
+
+
+class RAGBatchResponse(BaseModel):
+    """RAG batch response model"""
+    results: List[RAGBatchItem]
+    metadata: dict
+
+
 class RAGFeedbackRequest(BaseModel):
     """RAG feedback request model"""
     query: str
@@ -92,6 +113,89 @@ async def log_rag_request(
         logger.error("Failed to log RAG request", error=str(e))
 
 
+async def build_rag_response(rag_request: RAGRequest) -> RAGResponse:
+    """Run domain validation and the RAG pipeline for a single request"""
+    start_time = time.time()
+    
+    # CRITICAL FIX: Use RAG service domain validation (includes incident ID detection)
+    is_payment_related = rag_service.is_payment_domain_query(rag_request.query)
+    is_incident_id = rag_service.is_incident_id(rag_request.query)
+    
+    # Create domain validation response for compatibility
+    domain_validation = {
+        "is_payment_related": is_payment_related,
+        "is_incident_id": is_incident_id,
+        "confidence": 1.0 if is_incident_id else 0.8 if is_payment_related else 0.1,
+        "reason": "incident_id" if is_incident_id else "payment_domain" if is_payment_related else "non_payment_domain"
+    }
+    
+    if not is_payment_related:
+        # Non-payment query - return domain rejection
+        execution_time_ms = (time.time() - start_time) * 1000
+        
+        rag_result = RAGResult(
+            query=rag_request.query,
+            generated_answer="I specialize in payment-related issues only. Please ask about UPI transactions, payment gateways, card processing, bank integrations, payment errors, or other payment-related topics.",
+            confidence_score=1.0,
+            query_complexity="domain_rejection",
+            execution_time_ms=execution_time_ms,
+            rag_strategy="domain_filter",
+            sources=[],
+            retrieved_incidents=[],
+            timestamp=datetime.utcnow()
+        )
+        
+        return RAGResponse(
+            result=rag_result,
+            metadata={
+                "domain_validation": domain_validation,
+                "status": "rejected",
+                "reason": "non_payment_domain"
+            }
+        )
+    
+    # Process with RAG pipeline
+    logger.info("Processing RAG query", query=rag_request.query)
+    
+    rag_response = await rag_service.process_rag_query(rag_request.query)
+    
+    # Convert to API response format
+    rag_result = RAGResult(
+        query=rag_response.query,
+        generated_answer=rag_response.generated_answer,
+        confidence_score=rag_response.confidence_score,
+        query_complexity=rag_response.query_complexity.value,
+        execution_time_ms=rag_response.execution_time_ms,
+        rag_strategy=rag_response.rag_strategy,
+        sources=rag_response.sources if rag_request.include_sources else [],
+        retrieved_incidents=rag_response.retrieved_incidents,
+        timestamp=rag_response.timestamp
+    )
+    
+    # Prepare metadata
+    metadata = {
+        "domain_validation": domain_validation,
+        "status": "success",
+        "incidents_retrieved": len(rag_response.retrieved_incidents),
+        "confidence_level": "high" if rag_response.confidence_score >= 0.7 else "medium" if rag_response.confidence_score >= 0.4 else "low",
+        "rag_pipeline_version": "1.0"
+    }
+    
+    logger.info(
+        "RAG query completed",
+        query=rag_request.query,
+        complexity=rag_response.query_complexity.value,
+        confidence=rag_response.confidence_score,
+        incidents_count=len(rag_response.retrieved_incidents),
+        execution_time_ms=(time.time() - start_time) * 1000
+    )
+    
+    return RAGResponse(
+        result=rag_result,
+        metadata=metadata
+    )
+
+
 @router.post("/query", response_model=RAGResponse)
 async def process_rag_query(
     rag_request: RAGRequest,
@@ -115,94 +219,106 @@ async def process_rag_query(
         if not rag_request.query.strip():
             raise HTTPException(status_code=400, detail="Query cannot be empty")
         
-        # CRITICAL FIX: Use RAG service domain validation (includes incident ID detection)
-        is_payment_related = rag_service.is_payment_domain_query(rag_request.query)
-        is_incident_id = rag_service.is_incident_id(rag_request.query)
-        
-        # Create domain validation response for compatibility
-        domain_validation = {
-            "is_payment_related": is_payment_related,
-            "is_incident_id": is_incident_id,
-            "confidence": 1.0 if is_incident_id else 0.8 if is_payment_related else 0.1,
-            "reason": "incident_id" if is_incident_id else "payment_domain" if is_payment_related else "non_payment_domain"
-        }
+        rag_response = await build_rag_response(rag_request)
         
-        if not is_payment_related:
-            # Non-payment query - return domain rejection
-            execution_time_ms = (time.time() - start_time) * 1000
-            
-            rag_result = RAGResult(
-                query=rag_request.query,
-                generated_answer="I specialize in payment-related issues only. Please ask about UPI transactions, payment gateways, card processing, bank integrations, payment errors, or other payment-related topics.",
-                confidence_score=1.0,
-                query_complexity="domain_rejection",
-                execution_time_ms=execution_time_ms,
-                rag_strategy="domain_filter",
-                sources=[],
-                retrieved_incidents=[],
-                timestamp=datetime.utcnow()
+        if rag_response.metadata["status"] == "success":
+            # Log request in background
+            background_tasks.add_task(
+                log_rag_request,
+                db,
+                request,
+                rag_request,
+                rag_response.result,
+                (time.time() - start_time) * 1000
             )
-            
-            return RAGResponse(
-                result=rag_result,
-                metadata={
-                    "domain_validation": domain_validation,
-                    "status": "rejected",
-                    "reason": "non_payment_domain"
-                }
-            )
-        
-        # Process with RAG pipeline
-        logger.info("Processing RAG query", query=rag_request.query)
         
-        rag_response = await rag_service.process_rag_query(rag_request.query)
+        return rag_response
         
-        # Convert to API response format
-        rag_result = RAGResult(
-            query=rag_response.query,
-            generated_answer=rag_response.generated_answer,
-            confidence_score=rag_response.confidence_score,
-            query_complexity=rag_response.query_complexity.value,
-            execution_time_ms=rag_response.execution_time_ms,
-            rag_strategy=rag_response.rag_strategy,
-            sources=rag_response.sources if rag_request.include_sources else [],
-            retrieved_incidents=rag_response.retrieved_incidents,
-            timestamp=rag_response.timestamp
+    except HTTPException:
+        raise
+    except Exception as e:
+        execution_time_ms = (time.time() - start_time) * 1000
+        logger.error(
+            "RAG query failed",
+            query=rag_request.query,
+            error=str(e),
+            execution_time_ms=execution_time_ms
         )
+        raise HTTPException(
+            status_code=500,
+            detail=f"RAG query failed: {str(e)}"
+        )
+
+
+@router.post("/query/batch", response_model=RAGBatchResponse)
+async def process_rag_query_batch(
+    batch_request: RAGBatchRequest,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_database)
+):
+    """
+    Process several queries through the RAG pipeline in one round trip
+    
+    Each query is answered exactly as by /query, one after another (the
+    pipeline's model and vector calls are synchronous), and results are
+    returned in request order. A failing query yields an item with an error
+    instead of failing the whole batch.
+    """
+    start_time = time.time()
+    
+    try:
+        if any(not query.strip() for query in batch_request.queries):
+            raise HTTPException(status_code=400, detail="Queries cannot be empty")
         
-        # Prepare metadata
-        metadata = {
-            "domain_validation": domain_validation,
-            "status": "success",
-            "incidents_retrieved": len(rag_response.retrieved_incidents),
-            "confidence_level": "high" if rag_response.confidence_score >= 0.7 else "medium" if rag_response.confidence_score >= 0.4 else "low",
-            "rag_pipeline_version": "1.0"
-        }
+        rag_requests = [
+            RAGRequest(
+                query=query,
+                include_sources=batch_request.include_sources,
+                max_incidents=batch_request.max_incidents,
+                confidence_threshold=batch_request.confidence_threshold
+            )
+            for query in batch_request.queries
+        ]
         
-        execution_time_ms = (time.time() - start_time) * 1000
+        results = []
+        failed_count = 0
+        for rag_request in rag_requests:
+            try:
+                rag_response = await build_rag_response(rag_request)
+            except Exception as e:
+                failed_count += 1
+                logger.error("RAG batch item failed", query=rag_request.query, error=str(e))
+                results.append(RAGBatchItem(query=rag_request.query, error=f"RAG query failed: {str(e)}"))
+                continue
+            
+            if rag_response.metadata["status"] == "success":
+                background_tasks.add_task(
+                    log_rag_request,
+                    db,
+                    request,
+                    rag_request,
+                    rag_response.result,
+                    rag_response.result.execution_time_ms
+                )
+            results.append(RAGBatchItem(query=rag_request.query, response=rag_response))
         
-        # Log request in background
-        background_tasks.add_task(
-            log_rag_request,
-            db,
-            request,
-            rag_request,
-            rag_result,
-            execution_time_ms
-        )
+        execution_time_ms = (time.time() - start_time) * 1000
         
         logger.info(
-            "RAG query completed",
-            query=rag_request.query,
-            complexity=rag_response.query_complexity.value,
-            confidence=rag_response.confidence_score,
-            incidents_count=len(rag_response.retrieved_incidents),
+            "RAG batch completed",
+            queries_count=len(rag_requests),
+            failed_count=failed_count,
             execution_time_ms=execution_time_ms
         )
         
-        return RAGResponse(
-            result=rag_result,
-            metadata=metadata
+        return RAGBatchResponse(
+            results=results,
+            metadata={
+                "queries_count": len(rag_requests),
+                "failed_count": failed_count,
+                "execution_time_ms": execution_time_ms
+            }
         )
         
     except HTTPException:
@@ -210,14 +326,14 @@ async def process_rag_query(
     except Exception as e:
         execution_time_ms = (time.time() - start_time) * 1000
         logger.error(
-            "RAG query failed",
-            query=rag_request.query,
+            "RAG batch query failed",
+            queries_count=len(batch_request.queries),
             error=str(e),
             execution_time_ms=execution_time_ms
         )
         raise HTTPException(
             status_code=500,
-            detail=f"RAG query failed: {str(e)}"
+            detail=f"RAG batch query failed: {str(e)}"
         )
 
 
@@ -424,8 +424,8 @@ async def extract_and_learn_from_slack(hours_back: int = 24) -> Dict[str, Any]:
     """
     print(f"🚀 Starting Slack extraction from last {hours_back} hours...")
     
-    # Initialize extractor
-    if not await slack_extractor.initialize():
+    # Initialize extractor, reusing an earlier channel lookup if there is one
+    if not slack_extractor.issues_channel_id and not await slack_extractor.initialize():
         return {"success": False, "error": "Failed to initialize Slack connection"}
     
     # Extract incidents
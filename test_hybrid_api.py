@@ -6,16 +6,33 @@ Test the hybrid search API endpoint
 import asyncio
 import json
 import requests
+import socket
 import time
 
-def test_hybrid_search_api():
+import httpx
+
+from conftest_client import BASE_URL, JSON_HEADERS, SESSION, make_client
+
+# Report formatting
+SEP_EQ = "=" * 60
+SEP_DASH = "-" * 60
+
+# Hybrid search bodies only differ by query, so the rest is serialized once
+HYBRID_SEARCH_TEMPLATE = '{{"query": {query}, "top_k": 3, "search_type": "hybrid"}}'
+
+async def post_search(client, path, body):
+    """POST a serialized search request and return (status_code, response_text, execution_time_ms)"""
+    start_time = time.time()
+    response = await client.post(path, content=body, headers=JSON_HEADERS)
+    execution_time = (time.time() - start_time) * 1000
+    return response.status_code, response.text, execution_time
+
+async def run_hybrid_search_api():
     """Test the hybrid search API endpoint"""
     
     print("🧪 Testing Hybrid Search API")
     print("=" * 40)
     
-    base_url = "http://localhost:8000"
-    
     # Test queries
     test_queries = [
         {
@@ -40,32 +57,36 @@ def test_hybrid_search_api():
         }
     ]
     
-    for i, test_case in enumerate(test_queries, 1):
+    # Test hybrid search endpoint with all queries and the suggestions lookup in
+    # flight at once over one pooled keep-alive client
+    async with make_client(timeout=httpx.Timeout(30, connect=2), max_connections=8) as client:
+        *responses, suggestions_response = await asyncio.gather(
+            *(
+                post_search(
+                    client,
+                    "/api/v1/search/hybrid",
+                    HYBRID_SEARCH_TEMPLATE.format(query=json.dumps(test_case["query"]))
+                )
+                for test_case in test_queries
+            ),
+            client.get("/api/v1/search/suggestions"),
+            return_exceptions=True
+        )
+    
+    for i, (test_case, response) in enumerate(zip(test_queries, responses), 1):
         print(f"\n🔍 Test {i}: {test_case['description']}")
         print(f"Query: '{test_case['query']}'")
-        print("-" * 60)
+        print(SEP_DASH)
         
         try:
-            # Test hybrid search endpoint
-            start_time = time.time()
-            
-            response = requests.post(
-                f"{base_url}/api/v1/search/hybrid",
-                json={
-                    "query": test_case["query"],
-                    "top_k": 3,
-                    "search_type": "hybrid"
-                },
-                headers={"Content-Type": "application/json"},
-                timeout=30
-            )
-            
-            execution_time = (time.time() - start_time) * 1000
+            if isinstance(response, Exception):
+                raise response
+            status_code, response_text, execution_time = response
             
-            if response.status_code == 200:
-                data = response.json()
+            if status_code == 200:
+                data = json.loads(response_text)
                 
-                print(f"✅ Status: {response.status_code}")
+                print(f"✅ Status: {status_code}")
                 print(f"⏱️  Response Time: {execution_time:.0f}ms")
                 print(f"📊 Results Found: {data['total_results']}")
                 print(f"🔍 Search Type: {data['search_type']}")
@@ -83,21 +104,23 @@ def test_hybrid_search_api():
                     print("❌ No results returned")
                     
             else:
-                print(f"❌ Status: {response.status_code}")
-                print(f"Error: {response.text}")
+                print(f"❌ Status: {status_code}")
+                print(f"Error: {response_text}")
                 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"❌ Request failed: {e}")
         except Exception as e:
             print(f"❌ Unexpected error: {e}")
     
-    print("\n" + "=" * 60)
+    print("\n" + SEP_EQ)
     print("🎯 Testing Complete!")
     
     # Test suggestions endpoint
     print("\n🔍 Testing Search Suggestions...")
     try:
-        response = requests.get(f"{base_url}/api/v1/search/suggestions")
+        response = suggestions_response
+        if isinstance(response, Exception):
+            raise response
         if response.status_code == 200:
             suggestions = response.json()["suggestions"]
             print("✅ Suggestions available:")
@@ -113,8 +136,17 @@ def test_backend_health():
     
     print("🏥 Checking Backend Health...")
     
+    # A raw TCP probe fails fast when nothing is listening on the port
     try:
-        response = requests.get("http://localhost:8000/api/v1/health", timeout=5)
+        socket.create_connection(("localhost", 8000), timeout=0.5).close()
+    except OSError:
+        print("❌ Backend is not running. Please start it with:")
+        print("   python -m uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload")
+        return False
+    
+    # Port is open; one HTTP request confirms the app itself is serving
+    try:
+        response = SESSION.get(f"{BASE_URL}/api/v1/health", timeout=(2, 5))
         if response.status_code == 200:
             print("✅ Backend is running")
             return True
@@ -129,6 +161,12 @@ def test_backend_health():
         print(f"❌ Health check failed: {e}")
         return False
 
+
+def test_hybrid_search_api():
+    """Run the hybrid search API checks; sync entry point so pytest collects it"""
+    asyncio.run(run_hybrid_search_api())
+
+
 if __name__ == "__main__":
     # Check if backend is running
     if test_backend_health():
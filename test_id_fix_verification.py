@@ -4,21 +4,69 @@ Test ID-First Search Fix Verification
 Verifies that incident IDs are now properly recognized and processed
 """
 
-import requests
-import json
-import time
+import asyncio
+import os
 from datetime import datetime
 
+import httpx
 
-def test_id_fix():
+from conftest_client import BASE_URL, JSON_HEADERS, LIMITER, SESSION, RagQueryResponse, make_client, rag_query_body
+
+# Report formatting
+SEP_EQ = "=" * 60
+SEP_DASH = "-" * 60
+TS_FMT = "%Y-%m-%d %H:%M:%S"
+
+# Identical (path, body) pairs within one run are answered from memory
+CACHE_RESPONSES = os.getenv("TEST_CACHE", "1") == "1"
+_response_cache = {}
+
+
+def store_response(key, status_code, response_text):
+    """Remember a response unless caching is disabled or the server failed"""
+    if CACHE_RESPONSES and status_code < 500:
+        _response_cache[key] = (status_code, response_text)
+
+
+def cached_post(path, body, timeout):
+    """POST through the shared session and return (status_code, response_text)"""
+    key = (path, body)
+    if CACHE_RESPONSES and key in _response_cache:
+        return _response_cache[key]
+    
+    response = SESSION.post(f"{BASE_URL}{path}", data=body, timeout=timeout)
+    store_response(key, response.status_code, response.text)
+    return response.status_code, response.text
+
+
+async def post_rag_query(client, semaphore, path, body, timeout):
+    """POST a serialized RAG query and return (status_code, response_text)"""
+    key = (path, body)
+    if CACHE_RESPONSES and key in _response_cache:
+        return _response_cache[key]
+    
+    async with semaphore:
+        await LIMITER.acquire()
+        response = await client.post(
+            path,
+            content=body,
+            headers=JSON_HEADERS,
+            timeout=httpx.Timeout(timeout, connect=2)
+        )
+        status_code, response_text = response.status_code, response.text
+    
+    store_response(key, status_code, response_text)
+    return status_code, response_text
+
+
+async def run_id_fix():
     """Test that the ID-first search fix is working"""
     print("🎯 Testing ID-First Search Fix")
-    print("=" * 60)
-    print(f"⏰ Test started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(SEP_EQ)
+    start_ts = datetime.now().strftime(TS_FMT)
+    print(f"⏰ Test started at: {start_ts}")
     print()
     
-    base_url = "http://localhost:8000"
-    
     # Test the exact scenario that was failing
     test_cases = [
         {
@@ -48,32 +96,41 @@ def test_id_fix():
         }
     ]
     
+    # Test with RAG endpoint, dispatching every case concurrently
+    semaphore = asyncio.Semaphore(4)
+    async with make_client(max_connections=16) as client:
+        responses = await asyncio.gather(
+            *(
+                post_rag_query(
+                    client,
+                    semaphore,
+                    "/api/v1/rag/query",
+                    rag_query_body(test_case["query"]),
+                    timeout=30
+                )
+                for test_case in test_cases
+            ),
+            return_exceptions=True
+        )
+    
     print("🔍 Testing RAG Endpoint with ID Recognition:")
-    print("-" * 60)
+    print(SEP_DASH)
     
-    for i, test_case in enumerate(test_cases, 1):
+    for i, (test_case, response) in enumerate(zip(test_cases, responses), 1):
         print(f"\n{i}. {test_case['description']}")
         print(f"   Query: \"{test_case['query']}\"")
         print(f"   Expected: {test_case['expected_behavior']}")
         
         try:
-            # Test with RAG endpoint
-            response = requests.post(
-                f"{base_url}/api/v1/rag/query",
-                json={
-                    "query": test_case["query"],
-                    "include_sources": True,
-                    "max_incidents": 3,
-                    "confidence_threshold": 0.1
-                },
-                timeout=30
-            )
+            if isinstance(response, Exception):
+                raise response
+            status_code, response_text = response
             
-            if response.status_code == 200:
-                result = response.json()
+            if status_code == 200:
+                result = RagQueryResponse.model_validate_json(response_text)
                 
                 # Check domain validation
-                domain_validation = result.get("metadata", {}).get("domain_validation", {})
+                domain_validation = result.metadata.get("domain_validation", {})
                 is_payment_related = domain_validation.get("is_payment_related", False)
                 is_incident_id = domain_validation.get("is_incident_id", False)
                 
@@ -83,9 +140,8 @@ def test_id_fix():
                 print(f"   📝 Reason: {domain_validation.get('reason', 'unknown')}")
                 
                 # Check if we got a proper response
-                rag_result = result.get("result", {})
-                generated_answer = rag_result.get("generated_answer", "")
-                retrieved_incidents = rag_result.get("retrieved_incidents", [])
+                generated_answer = result.result.generated_answer
+                retrieved_incidents = result.result.retrieved_incidents
                 
                 if "specialize in payment-related issues only" in generated_answer:
                     print(f"   ❌ ISSUE: Still getting domain rejection!")
@@ -99,40 +155,33 @@ def test_id_fix():
                     print(f"   💬 Response: {generated_answer[:100]}...")
                 
             else:
-                print(f"   ❌ API Error: {response.status_code}")
-                print(f"   📝 Response: {response.text[:100]}...")
+                print(f"   ❌ API Error: {status_code}")
+                print(f"   📝 Response: {response_text[:100]}...")
                 
         except Exception as e:
             print(f"   ❌ Error: {e}")
-        
-        time.sleep(1)  # Rate limiting
     
-    print("\n" + "=" * 60)
+    print("\n" + SEP_EQ)
     print("🎯 ID Fix Verification Complete!")
     print()
     
     # Test the specific failing scenario
     print("🔍 Testing Specific Failing Scenario:")
-    print("-" * 60)
+    print(SEP_DASH)
     
     failing_query = "JSP-1046"
     print(f"Testing exact failing query: '{failing_query}'")
     
     try:
-        response = requests.post(
-            f"{base_url}/api/v1/rag/query",
-            json={
-                "query": failing_query,
-                "include_sources": True,
-                "max_incidents": 3,
-                "confidence_threshold": 0.1
-            },
-            timeout=30
+        # Same body as the first loop case, so this is a cache hit by default
+        status_code, response_text = cached_post(
+            "/api/v1/rag/query",
+            rag_query_body(failing_query),
+            timeout=(2, 30)
         )
         
-        if response.status_code == 200:
-            result = response.json()
-            generated_answer = result.get("result", {}).get("generated_answer", "")
+        if status_code == 200:
+            generated_answer = RagQueryResponse.model_validate_json(response_text).result.generated_answer
             
             if "specialize in payment-related issues only" in generated_answer:
                 print("❌ STILL BROKEN: Getting domain rejection for incident ID")
@@ -144,12 +193,12 @@ def test_id_fix():
                 print("✅ FIXED: Incident ID is now properly recognized!")
                 print(f"Response: {generated_answer[:200]}...")
         else:
-            print(f"❌ API Error: {response.status_code}")
+            print(f"❌ API Error: {status_code}")
             
     except Exception as e:
         print(f"❌ Error: {e}")
     
-    print("\n" + "=" * 60)
+    print("\n" + SEP_EQ)
     print("🎉 Test Complete!")
     print()
     
@@ -167,5 +216,10 @@ def test_id_fix():
     print("• Test with curl to isolate frontend vs backend issues")
 
 
+def test_id_fix():
+    """Run the ID-first search fix checks; sync entry point so pytest collects it"""
+    asyncio.run(run_id_fix())
+
+
 if __name__ == "__main__":
     test_id_fix()
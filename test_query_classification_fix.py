@@ -4,81 +4,120 @@ Test Query Classification Fix
 Verifies that ticket IDs are detected before capability queries
 """
 
-import requests
+import asyncio
+import io
 import json
-import time
+import re
+import sys
 from datetime import datetime
+from types import MappingProxyType
 
+from conftest_client import make_client
 
-def test_query_classification_fix():
+# Ticket ID shape (e.g. JSP-1030), compiled once for every case
+TICKET_RE = re.compile(r"\b[A-Z]{2,5}-\d{3,6}\b")
+
+# Rate limiting is enforced server-side; honour its 429 responses a few times
+MAX_RATE_LIMIT_RETRIES = 3
+MAX_BACKOFF = 5.0
+
+
+def retry_after_seconds(response):
+    """Seconds to wait before retrying a 429 response (defaults to 1, capped at MAX_BACKOFF)"""
+    try:
+        return min(max(float(response.headers.get("Retry-After", 1)), 0), MAX_BACKOFF)
+    except ValueError:
+        return 1
+
+
+# Test cases that were failing before the fix
+TEST_CASES = tuple(MappingProxyType(test_case) for test_case in [
+    {
+        "query": "can you help me to solve this JSP-1030",
+        "description": "Original failing case - capability words + ticket ID",
+        "expected_behavior": "Should detect JSP-1030 and do ticket lookup",
+        "should_not_get": "capabilities response"
+    },
+    {
+        "query": "JSP-1030 can you explain me this problem",
+        "description": "Ticket ID + capability words",
+        "expected_behavior": "Should detect JSP-1030 and do ticket lookup",
+        "should_not_get": "capabilities response"
+    },
+    {
+        "query": "help me with JSP-1046 issue",
+        "description": "Help request + ticket ID",
+        "expected_behavior": "Should detect JSP-1046 and do ticket lookup",
+        "should_not_get": "capabilities response"
+    },
+    {
+        "query": "what can you tell me about JSP-1052",
+        "description": "Capability question + ticket ID",
+        "expected_behavior": "Should detect JSP-1052 and do ticket lookup",
+        "should_not_get": "capabilities response"
+    },
+    {
+        "query": "what can you do",
+        "description": "Pure capability query without ticket ID",
+        "expected_behavior": "Should show capabilities",
+        "should_not_get": "incident search"
+    },
+    {
+        "query": "can you help me",
+        "description": "Pure help request without ticket ID",
+        "expected_behavior": "Should show capabilities",
+        "should_not_get": "incident search"
+    }
+])
+
+
+async def run_query_classification_fix():
     """Test that the query classification fix is working"""
     print("🎯 Testing Query Classification Fix")
     print("=" * 60)
     print(f"⏰ Test started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print()
     
-    base_url = "http://localhost:8000"
+    # Test with RAG endpoint, sending all cases concurrently over one
+    # keep-alive client; the semaphore bounds in-flight requests and the
+    # client only waits when the server asks it to via 429 + Retry-After
+    semaphore = asyncio.Semaphore(4)
+    
+    async def post_query(client, test_case):
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            async with semaphore:
+                response = await client.post(
+                    "/api/v1/rag/query",
+                    json={
+                        "query": test_case["query"],
+                        "include_sources": True,
+                        "max_incidents": 3,
+                        "confidence_threshold": 0.1
+                    }
+                )
+            if response.status_code != 429 or attempt == MAX_RATE_LIMIT_RETRIES:
+                return response
+            await asyncio.sleep(retry_after_seconds(response))
     
-    # Test cases that were failing before the fix
-    test_cases = [
-        {
-            "query": "can you help me to solve this JSP-1030",
-            "description": "Original failing case - capability words + ticket ID",
-            "expected_behavior": "Should detect JSP-1030 and do ticket lookup",
-            "should_not_get": "capabilities response"
-        },
-        {
-            "query": "JSP-1030 can you explain me this problem",
-            "description": "Ticket ID + capability words",
-            "expected_behavior": "Should detect JSP-1030 and do ticket lookup",
-            "should_not_get": "capabilities response"
-        },
-        {
-            "query": "help me with JSP-1046 issue",
-            "description": "Help request + ticket ID",
-            "expected_behavior": "Should detect JSP-1046 and do ticket lookup",
-            "should_not_get": "capabilities response"
-        },
-        {
-            "query": "what can you tell me about JSP-1052",
-            "description": "Capability question + ticket ID",
-            "expected_behavior": "Should detect JSP-1052 and do ticket lookup",
-            "should_not_get": "capabilities response"
-        },
-        {
-            "query": "what can you do",
-            "description": "Pure capability query without ticket ID",
-            "expected_behavior": "Should show capabilities",
-            "should_not_get": "incident search"
-        },
-        {
-            "query": "can you help me",
-            "description": "Pure help request without ticket ID",
-            "expected_behavior": "Should show capabilities",
-            "should_not_get": "incident search"
-        }
-    ]
+    async with make_client() as client:
+        responses = await asyncio.gather(
+            *(post_query(client, test_case) for test_case in TEST_CASES),
+            return_exceptions=True
+        )
     
     print("🔍 Testing Query Classification Priority:")
     print("-" * 60)
     
-    for i, test_case in enumerate(test_cases, 1):
-        print(f"\n{i}. {test_case['description']}")
-        print(f"   Query: \"{test_case['query']}\"")
-        print(f"   Expected: {test_case['expected_behavior']}")
+    for i, (test_case, response) in enumerate(zip(TEST_CASES, responses), 1):
+        # Collect each case's report and emit it with a single write
+        buf = io.StringIO()
+        print(f"\n{i}. {test_case['description']}", file=buf)
+        print(f"   Query: \"{test_case['query']}\"", file=buf)
+        print(f"   Expected: {test_case['expected_behavior']}", file=buf)
         
         try:
-            # Test with RAG endpoint
-            response = requests.post(
-                f"{base_url}/api/v1/rag/query",
-                json={
-                    "query": test_case["query"],
-                    "include_sources": True,
-                    "max_incidents": 3,
-                    "confidence_threshold": 0.1
-                },
-                timeout=30
-            )
+            if isinstance(response, Exception):
+                raise response
             
             if response.status_code == 200:
                 result = response.json()
@@ -89,57 +128,65 @@ def test_query_classification_fix():
                 generated_answer = rag_result.get("generated_answer", "")
                 retrieved_incidents = rag_result.get("retrieved_incidents", [])
                 
-                print(f"   ✅ Status: SUCCESS")
-                print(f"   📊 Strategy: {rag_strategy}")
-                print(f"   📋 Incidents: {len(retrieved_incidents)}")
+                print(f"   ✅ Status: SUCCESS", file=buf)
+                print(f"   📊 Strategy: {rag_strategy}", file=buf)
+                print(f"   📋 Incidents: {len(retrieved_incidents)}", file=buf)
                 
                 # Check if we got the expected behavior
                 is_capabilities_response = "SherlockAI Capabilities" in generated_answer
                 is_incident_search = len(retrieved_incidents) > 0 or "exact_id" in rag_strategy
                 
                 if is_capabilities_response:
-                    print(f"   📋 RESPONSE TYPE: Capabilities")
+                    print(f"   📋 RESPONSE TYPE: Capabilities", file=buf)
                 elif is_incident_search:
-                    print(f"   🎯 RESPONSE TYPE: Incident Search")
+                    print(f"   🎯 RESPONSE TYPE: Incident Search", file=buf)
                 else:
-                    print(f"   ❓ RESPONSE TYPE: Other")
+                    print(f"   ❓ RESPONSE TYPE: Other", file=buf)
                 
                 # Verify expectations
                 if "ticket lookup" in test_case["expected_behavior"]:
                     if is_incident_search and not is_capabilities_response:
-                        print(f"   ✅ CORRECT: Got incident search as expected")
+                        print(f"   ✅ CORRECT: Got incident search as expected", file=buf)
                     else:
-                        print(f"   ❌ WRONG: Expected incident search but got capabilities")
-                        print(f"      Response preview: {generated_answer[:100]}...")
+                        print(f"   ❌ WRONG: Expected incident search but got capabilities", file=buf)
+                        print(f"      Response preview: {generated_answer[:100]}...", file=buf)
                 
                 elif "capabilities" in test_case["expected_behavior"]:
                     if is_capabilities_response and not is_incident_search:
-                        print(f"   ✅ CORRECT: Got capabilities as expected")
+                        print(f"   ✅ CORRECT: Got capabilities as expected", file=buf)
                     else:
-                        print(f"   ❌ WRONG: Expected capabilities but got incident search")
-                        print(f"      Response preview: {generated_answer[:100]}...")
+                        print(f"   ❌ WRONG: Expected capabilities but got incident search", file=buf)
+                        print(f"      Response preview: {generated_answer[:100]}...", file=buf)
                 
                 # Check what we should NOT get
                 if test_case["should_not_get"] == "capabilities response":
                     if is_capabilities_response:
-                        print(f"   ❌ PROBLEM: Got capabilities response when we shouldn't")
+                        print(f"   ❌ PROBLEM: Got capabilities response when we shouldn't", file=buf)
                     else:
-                        print(f"   ✅ GOOD: Avoided unwanted capabilities response")
+                        print(f"   ✅ GOOD: Avoided unwanted capabilities response", file=buf)
                 
                 elif test_case["should_not_get"] == "incident search":
                     if is_incident_search:
-                        print(f"   ❌ PROBLEM: Got incident search when we shouldn't")
+                        print(f"   ❌ PROBLEM: Got incident search when we shouldn't", file=buf)
+                    else:
+                        print(f"   ✅ GOOD: Avoided unwanted incident search", file=buf)
+                
+                # Check the ticket ID in the query is the one the answer talks about
+                query_ticket = TICKET_RE.search(test_case["query"])
+                if query_ticket:
+                    if query_ticket.group(0) in TICKET_RE.findall(generated_answer):
+                        print(f"   ✅ TICKET ID: {query_ticket.group(0)} referenced in answer", file=buf)
                     else:
-                        print(f"   ✅ GOOD: Avoided unwanted incident search")
+                        print(f"   ⚠️ TICKET ID: {query_ticket.group(0)} not referenced in answer", file=buf)
                 
             else:
-                print(f"   ❌ API Error: {response.status_code}")
-                print(f"   📝 Response: {response.text[:100]}...")
+                print(f"   ❌ API Error: {response.status_code}", file=buf)
+                print(f"   📝 Response: {response.text[:100]}...", file=buf)
                 
         except Exception as e:
-            print(f"   ❌ Error: {e}")
+            print(f"   ❌ Error: {e}", file=buf)
         
-        time.sleep(1)  # Rate limiting
+        sys.stdout.write(buf.getvalue())
     
     print("\n" + "=" * 60)
     print("🎯 Query Classification Fix Test Complete!")
@@ -169,5 +216,10 @@ def test_query_classification_fix():
     print("5. Should get: Capabilities response")
 
 
+def test_query_classification_fix():
+    """Run the query classification fix checks; sync entry point so pytest collects it"""
+    asyncio.run(run_query_classification_fix())
+
+
 if __name__ == "__main__":
     test_query_classification_fix()
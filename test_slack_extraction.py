@@ -9,10 +9,24 @@ import json
 import os
 from datetime import datetime
 
+import httpx
+
 # Set up environment
 os.environ.setdefault('PYTHONPATH', '.')
 
 from app.services.slack_extractor import extract_and_learn_from_slack, slack_extractor
+from conftest_client import BASE_URL, make_client
+
+# Single shared Slack handshake (auth + channel lookup) for every test
+_init_task = None
+
+
+async def get_initialized():
+    """Run slack_extractor.initialize() once and reuse its result"""
+    global _init_task
+    if _init_task is None:
+        _init_task = asyncio.ensure_future(slack_extractor.initialize())
+    return await _init_task
 
 
 async def test_slack_connection():
@@ -35,7 +49,7 @@ async def test_slack_connection():
     
     # Test connection
     try:
-        initialized = await slack_extractor.initialize()
+        initialized = await get_initialized()
         if initialized:
             print(f"✅ Connected to {slack_extractor.issues_channel} channel")
             print(f"📋 Channel ID: {slack_extractor.issues_channel_id}")
@@ -58,6 +72,10 @@ async def test_extraction():
     print("=" * 50)
     
     try:
+        if not await get_initialized():
+            print("❌ Slack extractor is not initialized")
+            return False
+        
         # Extract from last 24 hours
         result = await extract_and_learn_from_slack(hours_back=24)
         
@@ -90,10 +108,6 @@ async def test_api_endpoints():
     print("\n🌐 Testing API Endpoints...")
     print("=" * 50)
     
-    import requests
-    
-    base_url = "http://localhost:8000"
-    
     # Test endpoints
     endpoints = [
         ("/api/v1/slack/channel-info", "GET"),
@@ -101,15 +115,24 @@ async def test_api_endpoints():
         ("/api/v1/slack/test-extraction", "POST")
     ]
     
-    for endpoint, method in endpoints:
+    async def call_endpoint(client, endpoint, method):
+        if method == "GET":
+            return await client.get(endpoint, timeout=10)
+        return await client.post(endpoint, json={}, timeout=30)
+    
+    # Probe all endpoints concurrently on one keep-alive client
+    async with make_client() as client:
+        responses = await asyncio.gather(
+            *(call_endpoint(client, endpoint, method) for endpoint, method in endpoints),
+            return_exceptions=True
+        )
+    
+    for (endpoint, method), response in zip(endpoints, responses):
         try:
-            url = f"{base_url}{endpoint}"
             print(f"🔗 Testing {method} {endpoint}")
             
-            if method == "GET":
-                response = requests.get(url, timeout=10)
-            else:
-                response = requests.post(url, json={}, timeout=30)
+            if isinstance(response, Exception):
+                raise response
             
             if response.status_code == 200:
                 print(f"   ✅ Success: {response.status_code}")
@@ -120,8 +143,8 @@ async def test_api_endpoints():
                 print(f"   ❌ Failed: {response.status_code}")
                 print(f"   📝 Response: {response.text[:100]}...")
                 
-        except requests.exceptions.ConnectionError:
-            print(f"   ❌ Connection failed - is the server running on {base_url}?")
+        except httpx.ConnectError:
+            print(f"   ❌ Connection failed - is the server running on {BASE_URL}?")
         except Exception as e:
             print(f"   ❌ Error: {e}")
         
@@ -6,8 +6,9 @@ This script loads issues into the vector database and provides utilities for tra
 
 import json
 import asyncio
+import hashlib
 import os
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any
 from datetime import datetime
 
 # Set up environment
@@ -20,83 +21,139 @@ from app.models import Issue, IssueCreate
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+# ijson streams issues one at a time; without it the file is loaded whole
+try:
+    import ijson
+    JSON_ERRORS = (json.JSONDecodeError, ijson.JSONError)
+except ImportError:
+    ijson = None
+    JSON_ERRORS = (json.JSONDecodeError,)
+
+# Issues embedded and stored per training step
+TRAIN_BATCH_SIZE = 128
+
 class SherlockAITrainer:
     """Training utilities for SherlockAI"""
     
     def __init__(self):
         self.ai_service = ai_service
+        # Embeddings already computed in this run, keyed by a hash of their text
+        self._emb_cache: Dict[bytes, List[float]] = {}
         
-    async def load_issues_from_json(self, json_file: str = "issues.json") -> List[Dict[str, Any]]:
-        """Load issues from JSON file"""
+    async def load_issues_from_json(self, json_file: str = "issues.json") -> AsyncIterator[Dict[str, Any]]:
+        """Stream issues from a JSON file"""
+        count = 0
         try:
-            with open(json_file, 'r') as f:
-                issues = json.load(f)
-            print(f"✅ Loaded {len(issues)} issues from {json_file}")
-            return issues
+            with open(json_file, 'rb') as f:
+                issues = ijson.items(f, "item", use_float=True) if ijson else json.load(f)
+                for issue in issues:
+                    count += 1
+                    yield issue
+            print(f"✅ Loaded {count} issues from {json_file}")
         except FileNotFoundError:
             print(f"❌ File {json_file} not found")
-            return []
-        except json.JSONDecodeError as e:
+        except JSON_ERRORS as e:
             print(f"❌ Error parsing JSON: {e}")
-            return []
     
-    async def add_issue_to_database(self, db: AsyncSession, issue_data: Dict[str, Any]) -> bool:
-        """Add a single issue to the database"""
+    def build_issue(self, issue_data: Dict[str, Any]) -> Issue:
+        """Build an Issue row from its JSON representation"""
+        return Issue(
+            id=issue_data["id"],
+            title=issue_data["title"],
+            description=issue_data["description"],
+            resolution=issue_data.get("resolution", ""),
+            status="resolved",
+            tags=issue_data.get("tags", []),
+            created_at=datetime.fromisoformat(issue_data.get("created_at", "2024-01-01")),
+            resolved_by=issue_data.get("resolved_by", "system"),
+            priority="medium",
+            category="technical"
+        )
+    
+    async def add_issues_to_database(self, db: AsyncSession, rows: List[Issue]) -> int:
+        """Add prebuilt Issue rows in one transaction, skipping existing IDs"""
         try:
-            # Check if issue already exists
-            result = await db.execute(select(Issue).where(Issue.id == issue_data["id"]))
-            existing_issue = result.scalar_one_or_none()
+            # Fetch the IDs that already exist with a single query
+            result = await db.execute(
+                select(Issue.id).where(Issue.id.in_([row.id for row in rows]))
+            )
+            existing_ids = set(result.scalars())
             
-            if existing_issue:
-                print(f"⚠️  Issue {issue_data['id']} already exists in database")
-                return False
+            for issue_id in existing_ids:
+                print(f"⚠️  Issue {issue_id} already exists in database")
             
-            # Create new issue
-            issue = Issue(
-                id=issue_data["id"],
-                title=issue_data["title"],
-                description=issue_data["description"],
-                resolution=issue_data.get("resolution", ""),
-                status="resolved",
-                tags=issue_data.get("tags", []),
-                created_at=datetime.fromisoformat(issue_data.get("created_at", "2024-01-01")),
-                resolved_by=issue_data.get("resolved_by", "system"),
-                priority="medium",
-                category="technical"
-            )
+            # Keep the first row for each ID so duplicates in one batch don't
+            # collide on the primary key
+            new_issues = []
+            seen_ids = set(existing_ids)
+            for row in rows:
+                if row.id in seen_ids:
+                    if row.id not in existing_ids:
+                        print(f"⚠️  Issue {row.id} appears more than once, skipping duplicate")
+                    continue
+                seen_ids.add(row.id)
+                new_issues.append(row)
+            if not new_issues:
+                return 0
             
-            db.add(issue)
+            db.add_all(new_issues)
             await db.commit()
-            print(f"✅ Added issue {issue_data['id']} to database")
-            return True
+            print(f"✅ Added {len(new_issues)} issues to database")
+            return len(new_issues)
             
         except Exception as e:
-            print(f"❌ Error adding issue {issue_data.get('id', 'unknown')}: {e}")
+            print(f"❌ Error adding issues to database: {e}")
             await db.rollback()
+            return 0
+    
+    async def add_issue_to_database(self, db: AsyncSession, issue_data: Dict[str, Any]) -> bool:
+        """Add a single issue to the database"""
+        try:
+            row = self.build_issue(issue_data)
+        except Exception as e:
+            print(f"❌ Error adding issue {issue_data.get('id', 'unknown')}: {e}")
             return False
+        return await self.add_issues_to_database(db, [row]) == 1
+    
+    def issue_text(self, issue_data: Dict[str, Any]) -> str:
+        """Combined text that is embedded for an issue"""
+        return f"{issue_data['title']}. {issue_data['description']}. Resolution: {issue_data.get('resolution', '')}"
+    
+    def issue_metadata(self, issue_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Metadata stored alongside an issue's embedding"""
+        return {
+            "id": issue_data["id"],
+            "title": issue_data["title"],
+            "description": issue_data["description"],
+            "resolution": issue_data.get("resolution", ""),
+            "tags": issue_data.get("tags", []),
+            "created_at": issue_data.get("created_at", "2024-01-01"),
+            "resolved_by": issue_data.get("resolved_by", "system")
+        }
+    
+    async def embed_issues(self, issues: List[Dict[str, Any]]) -> List[List[float]]:
+        """Embed issues in batches, reusing embeddings computed earlier for the same text"""
+        keys = [
+            hashlib.blake2b(self.issue_text(issue).encode(), digest_size=16).digest()
+            for issue in issues
+        ]
+        
+        # Embed each distinct uncached text once, in as few requests as possible
+        pending = {key: self.issue_text(issue) for key, issue in zip(keys, issues) if key not in self._emb_cache}
+        if pending:
+            embeddings = await self.ai_service.batch_embed_texts(list(pending.values()), batch_size=100)
+            self._emb_cache.update(zip(pending.keys(), embeddings))
+        
+        return [self._emb_cache[key] for key in keys]
     
     async def add_issue_to_vector_db(self, issue_data: Dict[str, Any]) -> bool:
         """Add a single issue to the vector database"""
         try:
-            # Create combined text for embedding
-            combined_text = f"{issue_data['title']}. {issue_data['description']}. Resolution: {issue_data.get('resolution', '')}"
-            
             # Generate embedding
-            embedding = await self.ai_service.embed_text(combined_text, use_cache=False)
-            
-            # Prepare metadata
-            metadata = {
-                "id": issue_data["id"],
-                "title": issue_data["title"],
-                "description": issue_data["description"],
-                "resolution": issue_data.get("resolution", ""),
-                "tags": issue_data.get("tags", []),
-                "created_at": issue_data.get("created_at", "2024-01-01"),
-                "resolved_by": issue_data.get("resolved_by", "system")
-            }
+            embedding = (await self.embed_issues([issue_data]))[0]
             
             # Store in Pinecone
-            await self.ai_service.store_embedding(issue_data["id"], embedding, metadata)
+            await self.ai_service.store_embedding(issue_data["id"], embedding, self.issue_metadata(issue_data))
             print(f"✅ Added issue {issue_data['id']} to vector database")
             return True
             
@@ -111,30 +168,71 @@ class SherlockAITrainer:
         # Initialize database
         await init_database()
         
-        # Load issues
-        issues = await self.load_issues_from_json(json_file)
-        if not issues:
-            return {"total": 0, "database_added": 0, "vector_added": 0}
-        
-        stats = {"total": len(issues), "database_added": 0, "vector_added": 0}
+        stats = {"total": 0, "database_added": 0, "vector_added": 0}
         
         # Get database session
         async for db in get_database():
-            for issue in issues:
-                # Add to database
-                if await self.add_issue_to_database(db, issue):
-                    stats["database_added"] += 1
-                
-                # Add to vector database
-                if await self.add_issue_to_vector_db(issue):
-                    stats["vector_added"] += 1
+            # Stream issues and train on them one batch at a time
+            batch = []
+            async for issue in self.load_issues_from_json(json_file):
+                batch.append(issue)
+                if len(batch) == TRAIN_BATCH_SIZE:
+                    await self.train_batch(db, batch, stats)
+                    batch = []
+            if batch:
+                await self.train_batch(db, batch, stats)
             
             break  # Exit the async generator
         
+        if not stats["total"]:
+            return stats
+        
         print(f"\n🎉 Training completed!")
         print(f"📊 Stats: {stats['database_added']}/{stats['total']} added to database, {stats['vector_added']}/{stats['total']} added to vector DB")
         return stats
     
+    async def train_batch(self, db: AsyncSession, issues: List[Dict[str, Any]], stats: Dict[str, int]) -> None:
+        """Add a batch of issues to the database and the vector database"""
+        stats["total"] += len(issues)
+        
+        # Build the rows (including timestamp parsing) before touching the
+        # database so the transaction only covers the SELECT and the insert
+        rows = []
+        for issue in issues:
+            try:
+                rows.append(self.build_issue(issue))
+            except Exception as e:
+                print(f"❌ Error adding issue {issue.get('id', 'unknown')}: {e}")
+        
+        # Add to database in a single transaction
+        if rows:
+            stats["database_added"] += await self.add_issues_to_database(db, rows)
+        
+        # Skip only the issues that can't be turned into text and metadata
+        vector_items = []
+        for issue in issues:
+            try:
+                self.issue_text(issue)
+                vector_items.append((issue, self.issue_metadata(issue)))
+            except Exception as e:
+                print(f"❌ Error adding issue {issue.get('id', 'unknown')} to vector DB: {e}")
+        if not vector_items:
+            return
+        
+        # Add to vector database, embedding the batch in one request
+        try:
+            embeddings = await self.embed_issues([issue for issue, _ in vector_items])
+        except Exception as e:
+            print(f"❌ Error embedding issues: {e}")
+            return
+        
+        vector_added = await self.ai_service.store_embeddings([
+            (issue["id"], embedding, metadata)
+            for (issue, metadata), embedding in zip(vector_items, embeddings)
+        ])
+        stats["vector_added"] += vector_added
+        print(f"✅ Added {vector_added} issues to vector database")
+    
     async def add_single_issue(self, title: str, description: str, resolution: str, 
                              tags: List[str] = None, resolved_by: str = "manual") -> bool:
         """Add a single issue manually"""
@@ -156,9 +254,10 @@ class SherlockAITrainer:
         # Initialize database
         await init_database()
         
-        # Add to database
+        # Add to database, building the row before opening the session
+        row = self.build_issue(issue_data)
         async for db in get_database():
-            db_success = await self.add_issue_to_database(db, issue_data)
+            db_success = await self.add_issues_to_database(db, [row]) == 1
             break
         
         # Add to vector database
@@ -191,7 +290,7 @@ class SherlockAITrainer:
             # Search vector database
             results = await self.ai_service.search_similar(query_embedding, top_k=top_k)
             
-            print(f"📊 Found {len(results)} results:")
+            print(f"📊 Found {len(results)} results for '{query}':")
             for i, result in enumerate(results, 1):
                 print(f"  {i}. {result.get('title', 'No title')} (Score: {result.get('score', 0):.3f})")
             
@@ -221,9 +320,10 @@ async def main():
     
     # Test search
     print("\n🔍 Testing search functionality...")
-    await trainer.test_search("UPI payment failed")
-    await trainer.test_search("timeout error")
-    await trainer.test_search("webhook issues")
+    await asyncio.gather(*(
+        trainer.test_search(query)
+        for query in ["UPI payment failed", "timeout error", "webhook issues"]
+    ))
     
     print("\n✅ Training completed! Your SherlockAI model is now ready to use.")
     print("\n💡 To add new issues, you can:")